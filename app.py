@@ -1,13 +1,36 @@
+import hashlib
+import itertools
+from collections import OrderedDict
+
 import streamlit as st
 import anthropic
 
+DEFAULT_MODEL = "claude-sonnet-4-20250514"
+# Context window of DEFAULT_MODEL. The size guard below assumes the model
+# configured in secrets or config.yaml has at least this window; lower it
+# when switching to a model with a smaller one
+CONTEXT_WINDOW_TOKENS = 200_000
+
+# Prompt skeletons, filled in with the user's input on each request
+SUMMARIZE_PROMPT = "Summarize the following text concisely:\n\n{text}"
+DRAFT_PROMPT = "Write a draft based on this prompt: {prompt}\n\nContext: {context}"
+RESEARCH_PROMPT = "Research and provide detailed information about: {topic}"
+
+# Cheap local token estimate (about 4 characters per token for English). It
+# only decides when to count: prompts estimated at more than half of
+# CONTEXT_WINDOW_TOKENS are counted exactly before anything is rejected
+CHARS_PER_TOKEN = 4
+
+# Number of answers kept per session; the oldest is evicted first
+RESPONSE_CACHE_SIZE = 16
+
 st.set_page_config(page_title="Steve Wan's AI Legal Assistant", layout="wide")
 
 # Get API key from Streamlit secrets (for cloud deployment)
 # or from local config for local testing
 try:
     api_key = st.secrets["api_key"]
-    model = st.secrets.get("model", "claude-sonnet-4-20250514")
+    model = st.secrets.get("model", DEFAULT_MODEL)
 except:
     # Fallback to config.yaml for local development
     import yaml
@@ -15,12 +38,67 @@ except:
         with open("config.yaml", "r") as f:
             config = yaml.safe_load(f)
             api_key = config["api_key"]
-            model = config.get("model", "claude-sonnet-4-20250514")
+            model = config.get("model", DEFAULT_MODEL)
     except:
         st.error("Please configure your API key in Streamlit secrets or config.yaml")
         st.stop()
 
-client = anthropic.Anthropic(api_key=api_key)
+# Streamlit reruns this script on every interaction, so keep one client
+# (and its HTTP connection pool) alive across reruns
+@st.cache_resource
+def get_client(api_key):
+    return anthropic.Anthropic(api_key=api_key)
+
+client = get_client(api_key)
+
+def stream_completion(prompt, max_tokens):
+    with client.messages.stream(
+        model=model,
+        max_tokens=max_tokens,
+        messages=[{
+            "role": "user",
+            "content": prompt
+        }]
+    ) as stream:
+        yield from stream.text_stream
+
+def fits_context_window(prompt, max_tokens):
+    if len(prompt) // CHARS_PER_TOKEN + max_tokens <= CONTEXT_WINDOW_TOKENS // 2:
+        return True
+    count = client.messages.count_tokens(
+        model=model,
+        messages=[{
+            "role": "user",
+            "content": prompt
+        }]
+    )
+    return count.input_tokens + max_tokens <= CONTEXT_WINDOW_TOKENS
+
+def write_completion(label, prompt, max_tokens, use_cache=True):
+    # Stream the answer onto the page as it is generated. With use_cache,
+    # identical requests within a session reuse the earlier answer instead of
+    # paying for another API round trip
+    if not fits_context_window(prompt, max_tokens):
+        st.warning("The input is too long for the model. Please shorten it and try again.")
+        return
+    if use_cache:
+        cache = st.session_state.setdefault("response_cache", OrderedDict())
+        key = (model, max_tokens, hashlib.sha256(prompt.encode()).hexdigest())
+        if key in cache:
+            cache.move_to_end(key)
+            st.success(label)
+            st.write(cache[key])
+            return
+    # Wait for the first chunk before showing the label, so auth, rate-limit
+    # and network errors are raised here rather than under a success banner
+    stream = stream_completion(prompt, max_tokens)
+    first = next(stream, "")
+    st.success(label)
+    text = st.write_stream(itertools.chain([first], stream))
+    if use_cache:
+        cache[key] = text
+        if len(cache) > RESPONSE_CACHE_SIZE:
+            cache.popitem(last=False)
 
 st.title("⚖️ Steve Wan's AI Legal Assistant")
 
@@ -34,16 +112,11 @@ with tab1:
         if text_to_summarize:
             with st.spinner("Summarizing..."):
                 try:
-                    message = client.messages.create(
-                        model=model,
-                        max_tokens=1024,
-                        messages=[{
-                            "role": "user",
-                            "content": f"Summarize the following text concisely:\n\n{text_to_summarize}"
-                        }]
+                    write_completion(
+                        "Summary:",
+                        SUMMARIZE_PROMPT.format(text=text_to_summarize),
+                        max_tokens=1024
                     )
-                    st.success("Summary:")
-                    st.write(message.content[0].text)
                 except Exception as e:
                     st.error(f"Error: {str(e)}")
         else:
@@ -58,16 +131,12 @@ with tab2:
         if draft_prompt:
             with st.spinner("Generating draft..."):
                 try:
-                    message = client.messages.create(
-                        model=model,
+                    write_completion(
+                        "Draft:",
+                        DRAFT_PROMPT.format(prompt=draft_prompt, context=draft_context),
                         max_tokens=2048,
-                        messages=[{
-                            "role": "user",
-                            "content": f"Write a draft based on this prompt: {draft_prompt}\n\nContext: {draft_context}"
-                        }]
+                        use_cache=False
                     )
-                    st.success("Draft:")
-                    st.write(message.content[0].text)
                 except Exception as e:
                     st.error(f"Error: {str(e)}")
         else:
@@ -81,16 +150,12 @@ with tab3:
         if research_topic:
             with st.spinner("Researching..."):
                 try:
-                    message = client.messages.create(
-                        model=model,
+                    write_completion(
+                        "Research Results:",
+                        RESEARCH_PROMPT.format(topic=research_topic),
                         max_tokens=2048,
-                        messages=[{
-                            "role": "user",
-                            "content": f"Research and provide detailed information about: {research_topic}"
-                        }]
+                        use_cache=False
                     )
-                    st.success("Research Results:")
-                    st.write(message.content[0].text)
                 except Exception as e:
                     st.error(f"Error: {str(e)}")
         else: